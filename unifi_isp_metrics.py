@@ -10,31 +10,90 @@ This script:
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import hashlib
 import os
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Dict, Optional, Union
 import argparse
 
 
+def _isoformat_z(dt: datetime) -> str:
+    """Format a UTC datetime as ISO 8601 with a 'Z' suffix"""
+    return dt.isoformat().replace("+00:00", "Z")
+
+
+def _json_default(obj):
+    """Encode UTC datetimes for the stdlib json module the way orjson does with OPT_UTC_Z"""
+    if isinstance(obj, datetime):
+        return _isoformat_z(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# JSON helpers bound once at import: orjson when installed, else the stdlib.
+# _loads accepts bytes; _dumps returns bytes. Both paths write timezone-aware
+# UTC datetimes as ISO 8601 strings ending in "Z".
+try:
+    import orjson
+    _loads = orjson.loads
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_UTC_Z)
+except ImportError:
+    orjson = None
+    _loads = json.loads
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, default=_json_default).encode()
+
+
+# orjson options for the JSON files written by save_to_file
+JSON_FILE_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_UTC_Z if orjson is not None else None
+
+# How long a saved sites file is reused before the site list is fetched again (seconds)
+SITES_CACHE_TTL = 3600
+
+
 class UniFiAPIClient:
     """Client for interacting with the UniFi Site Manager API"""
     
     BASE_URL = "https://api.ui.com"
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, verbose: bool = False):
         """
         Initialize the API client
         
         Args:
             api_key: Your UniFi API key from unifi.ui.com
+            verbose: Print per-site details while building and sending queries
         """
         self.api_key = api_key
+        self.verbose = verbose
         self.headers = {
             "X-API-Key": api_key,
             "Accept": "application/json",
             "Content-Type": "application/json"
         }
+        
+        # Reuse connections (keep-alive) across requests and retry transient
+        # failures; the metrics query POST is read-only so it is safe to retry
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET", "POST"],
+            # Hand the last error response back instead of raising RetryError,
+            # so raise_for_status() and the error body printout still see it
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
     
     def get_all_sites(self, page_size: int = 100) -> List[Dict]:
         """
@@ -47,27 +106,41 @@ class UniFiAPIClient:
             List of site dictionaries
         """
         all_sites = []
+        count = 0
         next_token = None
         
+        # Only the pagination token changes between requests
+        url = f"{self.BASE_URL}/v1/sites"
+        params = {"pageSize": page_size}
+        
         print("Fetching sites from UniFi Site Manager API...")
         
         while True:
-            # Build URL with pagination
-            url = f"{self.BASE_URL}/v1/sites?pageSize={page_size}"
             if next_token:
-                url += f"&nextToken={next_token}"
+                params["nextToken"] = next_token
             
             try:
-                response = requests.get(url, headers=self.headers)
-                response.raise_for_status()
+                response = self.session.get(url, params=params)
+                # Only build the HTTPError on failure
+                if response.status_code >= 400:
+                    response.raise_for_status()
                 
-                data = response.json()
+                data = _loads(response.content)
                 
                 # Add sites from this page
+                # Pre-size the list when the API reports a total count
+                if not all_sites:
+                    total = data.get("meta", {}).get("totalCount")
+                    if total:
+                        all_sites = [None] * total
+                
+                # Add sites from this page; slice assignment grows the list
+                # if the reported total turns out to be too small
                 if "data" in data:
                     sites = data["data"]
-                    all_sites.extend(sites)
-                    print(f"Retrieved {len(sites)} sites (total: {len(all_sites)})")
+                    all_sites[count:count + len(sites)] = sites
+                    count += len(sites)
+                    print(f"Retrieved {len(sites)} sites (total: {count})")
                 
                 # Check for next page
                 if "nextToken" in data and data["nextToken"]:
@@ -81,6 +154,9 @@ class UniFiAPIClient:
                     print(f"Response: {e.response.text}")
                 raise
         
+        # Drop unused slots if fewer sites arrived than reported
+        del all_sites[count:]
+        
         print(f"Successfully retrieved {len(all_sites)} total sites")
         return all_sites
     
@@ -90,7 +166,9 @@ class UniFiAPIClient:
         sites: List[Dict],
         begin_timestamp: Optional[str] = None,
         end_timestamp: Optional[str] = None,
-        relative_time: Optional[str] = None
+        relative_time: Optional[str] = None,
+        chunk_size: int = 25,
+        max_workers: int = 8
     ) -> Dict:
         """
         Query ISP metrics for specific sites
@@ -101,10 +179,99 @@ class UniFiAPIClient:
             begin_timestamp: ISO 8601 timestamp for start of range (optional)
             end_timestamp: ISO 8601 timestamp for end of range (optional)
             relative_time: Relative time range like "24h", "7d", or "30d" (optional)
+            chunk_size: Maximum number of sites per request (default: 25)
+            max_workers: Maximum number of concurrent requests (default: 8)
             
         Returns:
             Dictionary containing ISP metrics data
         """
+        print(f"\nQuerying ISP metrics ({metric_type} intervals) for {len(sites)} sites...")
+        if self.verbose:
+            lines = ["Sites in request:"]
+            for i, site in enumerate(sites, 1):
+                lines.append(f"  {i}. siteId: {site.get('siteId', 'N/A'):.20}... hostId: {site.get('hostId', 'N/A'):.30}...")
+            sys.stdout.write("\n".join(lines) + "\n")
+        
+        # Split the sites into chunks and query them concurrently over the
+        # shared session; a failed request only loses the sites in its chunk
+        chunks = [sites[i:i + chunk_size] for i in range(0, len(sites), chunk_size)]
+        if len(chunks) > 1:
+            print(f"Sending {len(chunks)} requests of up to {chunk_size} sites ({max_workers} at a time)")
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._query_chunk, metric_type, chunk) for chunk in chunks]
+        
+        # Every request has finished once the executor exits; collect the
+        # responses in chunk order and report failures from this thread
+        results = []
+        errors = []
+        for i, (chunk, future) in enumerate(zip(chunks, futures), 1):
+            try:
+                results.append(future.result())
+            except (requests.exceptions.RequestException, ValueError) as e:
+                errors.append(e)
+                print(f"Error querying ISP metrics (request {i}/{len(chunks)}, {len(chunk)} sites): {e}")
+                response = getattr(e, 'response', None)
+                if response is not None:
+                    print(f"Response: {response.text}")
+        
+        # Nothing to merge if every request failed
+        if errors and not results:
+            raise errors[0]
+        
+        # Merge the chunk responses back into a single response
+        # (the first response supplies the envelope fields such as traceId)
+        data = results[0] if results else {}
+        merged = dict(data.get("data") or {})
+        metrics = []
+        messages = []
+        status = merged.get("status")
+        for result in results:
+            result_data = result.get("data") or {}
+            # Check for partial success
+            if result_data.get("status") == "partialSuccess":
+                message = result_data.get("message", "Partial success")
+                print(f"Warning: {message}")
+                messages.append(message)
+                status = "partialSuccess"
+            metrics.extend(result_data.get("metrics") or [])
+        if errors:
+            message = f"{len(errors)} of {len(chunks)} requests failed"
+            print(f"Warning: {message}")
+            messages.append(message)
+            status = "partialSuccess"
+        merged["metrics"] = metrics
+        if status is not None:
+            merged["status"] = status
+        if messages:
+            merged["message"] = "; ".join(messages)
+        data["data"] = merged
+        
+        # Show how many sites returned data
+        metrics_returned = len(metrics)
+        print(f"Successfully retrieved ISP metrics for {metrics_returned}/{len(sites)} sites")
+        
+        if metrics_returned < len(sites):
+            print(f"⚠️  Warning: Only {metrics_returned} of {len(sites)} sites returned data")
+            print(f"   This could mean some sites don't have metrics available for this time period")
+        
+        return data
+    
+    def _query_chunk(self, metric_type: str, sites: List[Dict]) -> Dict:
+        """
+        Send a single ISP metrics query for a subset of sites
+        
+        Args:
+            metric_type: Either "5m" or "1h" for 5-minute or 1-hour intervals
+            sites: List of site query objects for this request
+            
+        Returns:
+            Dictionary containing the API response for these sites
+            
+        Raises:
+            requests.exceptions.RequestException: The request failed; reported by
+                query_isp_metrics, which merges the chunks that succeeded
+        """
         url = f"{self.BASE_URL}/ea/isp-metrics/{metric_type}/query"
         
         # Build the request payload
@@ -112,83 +279,128 @@ class UniFiAPIClient:
             "sites": sites
         }
         
-        print(f"\nQuerying ISP metrics ({metric_type} intervals) for {len(sites)} sites...")
-        print(f"Sites in request:")
-        for i, site in enumerate(sites, 1):
-            print(f"  {i}. siteId: {site.get('siteId', 'N/A')[:20]}... hostId: {site.get('hostId', 'N/A')[:30]}...")
-        
-        try:
-            response = requests.post(url, headers=self.headers, json=payload)
+        # Encode the body once ourselves; the session already sends
+        # Content-Type: application/json
+        response = self.session.post(url, data=_dumps(payload))
+        if response.status_code >= 400:
             response.raise_for_status()
-            
-            data = response.json()
-            
-            # Check for partial success
-            if data.get("data", {}).get("status") == "partialSuccess":
-                print(f"Warning: {data['data'].get('message', 'Partial success')}")
-            
-            # Show how many sites returned data
-            metrics_returned = len(data.get("data", {}).get("metrics", []))
-            print(f"Successfully retrieved ISP metrics for {metrics_returned}/{len(sites)} sites")
-            
-            if metrics_returned < len(sites):
-                print(f"⚠️  Warning: Only {metrics_returned} of {len(sites)} sites returned data")
-                print(f"   This could mean some sites don't have metrics available for this time period")
-            
-            return data
-            
-        except requests.exceptions.RequestException as e:
-            print(f"Error querying ISP metrics: {e}")
-            if hasattr(e, 'response') and e.response is not None:
-                print(f"Response: {e.response.text}")
-            raise
+        
+        return _loads(response.content)
     
     def build_site_queries(
         self,
         sites: List[Dict],
-        begin_timestamp: str,
-        end_timestamp: str
+        begin_timestamp: Union[str, datetime],
+        end_timestamp: Union[str, datetime]
     ) -> List[Dict]:
         """
         Build site query objects from site list
         
         Args:
             sites: List of site dictionaries from get_all_sites()
-            begin_timestamp: ISO 8601 timestamp for start
-            end_timestamp: ISO 8601 timestamp for end
+            begin_timestamp: ISO 8601 timestamp or timezone-aware datetime for start
+            end_timestamp: ISO 8601 timestamp or timezone-aware datetime for end
             
         Returns:
             List of site query objects for the ISP metrics API
         """
-        site_queries = []
-        
         print(f"\nBuilding queries for {len(sites)} sites...")
         
-        for i, site in enumerate(sites, 1):
-            site_query = {
+        site_queries = [
+            {
                 "siteId": site["siteId"],
                 "hostId": site["hostId"],
                 "beginTimestamp": begin_timestamp,
                 "endTimestamp": end_timestamp
             }
-            site_queries.append(site_query)
-            
-            # Show site info
-            site_name = site.get('meta', {}).get('name', 'Unknown')
-            print(f"  {i}. {site_name} (siteId: {site['siteId'][:20]}...)")
+            for site in sites
+        ]
+        
+        # Show site info
+        if self.verbose:
+            sys.stdout.write("".join(
+                f"  {i}. {site.get('meta', {}).get('name', 'Unknown')} (siteId: {site['siteId']:.20}...)\n"
+                for i, site in enumerate(sites, 1)
+            ))
         
         print(f"Total queries built: {len(site_queries)}")
         
         return site_queries
 
 
+def iter_json_chunks(value, level: int = 0) -> Iterator[bytes]:
+    """
+    Encode a value as 2-space indented JSON, in chunks, using orjson
+    
+    Dicts are walked key by key and lists are encoded one item at a time, so
+    only a single list item (e.g. one site's metrics) is serialized at once.
+    The output matches orjson.dumps(value, option=JSON_FILE_OPTIONS).
+    
+    Args:
+        value: JSON-serializable value
+        level: Indentation level of the value
+    """
+    pad = b"\n" + b"  " * (level + 1)
+    if isinstance(value, dict) and value:
+        yield b"{"
+        for i, (key, item) in enumerate(value.items()):
+            yield (b"," if i else b"") + pad + orjson.dumps(key) + b": "
+            yield from iter_json_chunks(item, level + 1)
+        yield b"\n" + b"  " * level + b"}"
+    elif isinstance(value, list) and value:
+        yield b"["
+        for i, item in enumerate(value):
+            yield (b"," if i else b"") + pad
+            yield orjson.dumps(item, option=JSON_FILE_OPTIONS).replace(b"\n", pad)
+        yield b"\n" + b"  " * level + b"]"
+    else:
+        yield orjson.dumps(value, option=JSON_FILE_OPTIONS)
+
+
 def save_to_file(data: Dict, filename: str) -> None:
     """Save data to a JSON file"""
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=2)
+    # Both paths write the JSON incrementally rather than building the whole
+    # document in memory first (json.dump writes iterencode() chunks)
+    if orjson is not None:
+        with open(filename, 'wb') as f:
+            f.writelines(iter_json_chunks(data))
+    else:
+        with open(filename, 'w') as f:
+            json.dump(data, f, indent=2, default=_json_default)
     print(f"Data saved to {filename}")
 
 
+def api_key_fingerprint(api_key: str) -> str:
+    """Short, non-reversible identifier for an API key (never store the key itself)"""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+def load_cached_sites(filename: str, api_key: str, max_age: float = SITES_CACHE_TTL) -> Optional[List[Dict]]:
+    """
+    Load the site list saved by a previous run, if it can be reused
+    
+    Args:
+        filename: Sites JSON file written by a previous run
+        api_key: API key the sites are needed for
+        max_age: Maximum age of the file in seconds (default: 1 hour)
+        
+    Returns:
+        List of site dictionaries, or None if the file is missing, stale,
+        unreadable or was fetched with a different API key
+    """
+    try:
+        if time.time() - os.path.getmtime(filename) >= max_age:
+            return None
+        with open(filename, 'rb') as f:
+            data = _loads(f.read())
+    except (OSError, ValueError):
+        return None
+    
+    if data.get("api_key_hash") != api_key_fingerprint(api_key):
+        return None
+    return data.get("sites")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Fetch UniFi sites and query ISP metrics"
@@ -230,25 +442,46 @@ def main():
         default="isp_metrics_dashboard.html",
         help="Output HTML file (default: isp_metrics_dashboard.html)"
     )
+    parser.add_argument(
+        "--refresh-sites",
+        action="store_true",
+        help="Always fetch the site list, even if the sites file is less than an hour old"
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Print per-site details for each query"
+    )
     
     args = parser.parse_args()
     
     # Initialize API client
-    client = UniFiAPIClient(args.api_key)
+    client = UniFiAPIClient(args.api_key, verbose=args.verbose)
+    
+    # Take the current time once; it stamps both output files and ends the query range.
+    # Datetimes are passed through as-is and formatted by the JSON encoder.
+    now = datetime.now(timezone.utc)
     
     # Step 1: Get all sites
     print("=" * 60)
     print("STEP 1: Fetching Sites")
     print("=" * 60)
-    sites = client.get_all_sites()
     
-    # Save sites to file
-    sites_data = {
-        "timestamp": datetime.utcnow().isoformat() + "Z",
-        "total_sites": len(sites),
-        "sites": sites
-    }
-    save_to_file(sites_data, args.sites_output)
+    # Site inventory rarely changes, so reuse a recent sites file when possible
+    sites = None if args.refresh_sites else load_cached_sites(args.sites_output, args.api_key)
+    if sites is not None:
+        print(f"Using {len(sites)} cached sites from {args.sites_output} (use --refresh-sites to refetch)")
+    else:
+        sites = client.get_all_sites()
+        
+        # Save sites to file
+        sites_data = {
+            "timestamp": now,
+            "api_key_hash": api_key_fingerprint(args.api_key),
+            "total_sites": len(sites),
+            "sites": sites
+        }
+        save_to_file(sites_data, args.sites_output)
     
     # Step 2: Query ISP metrics for all sites
     print("\n" + "=" * 60)
@@ -256,16 +489,13 @@ def main():
     print("=" * 60)
     
     # Calculate time range
-    end_time = datetime.utcnow()
-    begin_time = end_time - timedelta(hours=args.hours_back)
-    
-    begin_timestamp = begin_time.isoformat() + "Z"
-    end_timestamp = end_time.isoformat() + "Z"
+    begin_time = now - timedelta(hours=args.hours_back)
+    end_time = now
     
-    print(f"Time range: {begin_timestamp} to {end_timestamp}")
+    print(f"Time range: {_isoformat_z(begin_time)} to {_isoformat_z(end_time)}")
     
     # Build site queries
-    site_queries = client.build_site_queries(sites, begin_timestamp, end_timestamp)
+    site_queries = client.build_site_queries(sites, begin_time, end_time)
     
     # Query ISP metrics
     isp_metrics = client.query_isp_metrics(
@@ -275,10 +505,10 @@ def main():
     
     # Save ISP metrics to file
     metrics_data = {
-        "query_timestamp": datetime.utcnow().isoformat() + "Z",
+        "query_timestamp": now,
         "metric_type": args.metric_type,
-        "begin_timestamp": begin_timestamp,
-        "end_timestamp": end_timestamp,
+        "begin_timestamp": begin_time,
+        "end_timestamp": end_time,
         "total_sites_queried": len(site_queries),
         "response": isp_metrics
     }